@@ -1,70 +1,177 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
 import io
-import traceback
-from flask import Flask, request, jsonify
+import json
+import logging
+from logging.handlers import WatchedFileHandler
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from datetime import date, time, timedelta
+from operator import attrgetter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, Response, request, jsonify, stream_with_context
+import orjson
 
 # Importaciones de openpyxl
 from openpyxl import load_workbook
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-from openpyxl.cell import MergedCell
+from openpyxl.cell.read_only import ReadOnlyCell, EMPTY_CELL
 from openpyxl.formatting.rule import Rule, ColorScaleRule, DataBarRule
 from openpyxl.styles.colors import Color
+from openpyxl.styles.numbers import BUILTIN_FORMATS, BUILTIN_FORMATS_MAX_SIZE
 from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._reader import WorkSheetParser
+
+# Lector compilado (Rust) opcional para el modo ?mode=values; sin él se usa openpyxl.
+try:
+    from python_calamine import CalamineWorkbook, SheetTypeEnum
+except ImportError:
+    CalamineWorkbook = SheetTypeEnum = None
+
+# Hash no criptográfico opcional (xxh3) para la caché de respuestas; sin él se usa BLAKE2b.
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 # --- Inicialización de la Aplicación Flask ---
 app = Flask(__name__)
+log = logging.getLogger(__name__)
+# Por debajo de LOG_LEVEL (WARNING por defecto) los mensajes se descartan sin llegar a formatearse.
+# Se escriben en stderr y, si se indica LOG_FILE, también en ese archivo. La rotación queda en
+# manos de logrotate: con preload_app todos los workers comparten el handler, y WatchedFileHandler
+# reabre el archivo cuando cambia en lugar de rotarlo cada proceso por su cuenta.
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'
+_log_level_name = os.environ.get('LOG_LEVEL', 'WARNING').upper()
+_log_level = logging.getLevelName(_log_level_name)
+log.setLevel(_log_level if isinstance(_log_level, int) else logging.WARNING)
+log.propagate = False
+_log_handlers = [logging.StreamHandler()]
+if os.environ.get('LOG_FILE'):
+    _log_handlers.append(WatchedFileHandler(os.environ['LOG_FILE']))
+for _handler in _log_handlers:
+    _handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log.addHandler(_handler)
+if not isinstance(_log_level, int):
+    log.warning("LOG_LEVEL no válido (%s); se usa WARNING", _log_level_name)
+# Tamaño máximo de subida (MB); por encima Flask responde 413 antes de leer el archivo.
+MAX_UPLOAD_MB = int(os.environ.get('MAX_UPLOAD_MB', '100'))
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
+
+# Los datos de cada hoja se emiten por columnas de atributos (matrices paralelas de valores y
+# de estilos) en lugar de un objeto por celda; la dirección se deduce de la posición.
+# El esquema se documenta una vez en la clave 'schema' de la respuesta.
+RESPONSE_SCHEMA = {
+    'values': ("data.values[i][j] es el valor de la celda de la fila i+1 y la columna j+1 "
+               "(values[0][0] es A1); una fila puede ser más corta que data.cols si termina en celdas vacías."),
+    'styles': ("data.styles[i] es null si ninguna celda de la fila tiene estilo o, si no, una lista "
+               "paralela a values[i] con el índice en la lista 'styles' del libro; null si la celda "
+               "no tiene estilo."),
+    'merged_cells': ("Rangos combinados de la hoja ('A1:B2'); el valor está en la celda superior "
+                     "izquierda y el resto de celdas del rango se emiten como celdas normales (vacías)."),
+    'dates': ("Las fechas y horas se emiten como texto ISO 8601 (p. ej. '2024-01-31T10:30:00'); "
+              "las duraciones (formato [h]:mm:ss) como número de segundos."),
+    'numbers': ("Los números enteros se emiten sin decimales (5, no 5.0) tanto con calamine "
+                "como con openpyxl en mode=values."),
+}
 
 # === FUNCIONES DE AYUDA PARA EXTRAER DATOS ===
 
-def get_serializable_color(color_obj):
-    """Garantiza que la salida sea SIEMPRE un tipo primitivo (string hexadecimal o None)."""
-    if color_obj is None:
-        return None
+def _serialize_color(color_obj):
+    # Los mismos códigos ARGB se repiten en muchos estilos: se comparte un único str internado.
+    rgb = color_obj.rgb
+    if rgb:
+        return sys.intern(str(rgb))
+    return str(color_obj)
+
+def _serialize_other_color(color_obj):
     if hasattr(color_obj, 'rgb') and color_obj.rgb:
         return str(color_obj.rgb)
     return str(color_obj)
 
-def extract_styles_from_cell(cell):
+# Conversión según la clase exacta del color: una búsqueda en un dict en lugar de comprobaciones
+# encadenadas. Las clases no registradas (p. ej. subclases) pasan por la comprobación genérica.
+_COLOR_SERIALIZERS = {
+    type(None): lambda color_obj: None,
+    Color: _serialize_color,
+    str: str,
+}
+
+def get_serializable_color(color_obj):
+    """Garantiza que la salida sea SIEMPRE un tipo primitivo (string hexadecimal o None)."""
+    return _COLOR_SERIALIZERS.get(color_obj.__class__, _serialize_other_color)(color_obj)
+
+_SIDE_NAMES = ('left', 'right', 'top', 'bottom')
+
+def _side_style(side):
+    if side is None or not side.style:
+        return None
+    return {'style': side.style, 'color': get_serializable_color(side.color)}
+
+def extract_style(font, fill, border, alignment, number_format):
     """Extrae estilos de celda, incluyendo colores correctamente."""
     style_data = {}
-    if not cell.has_style:
-        return style_data
-    if cell.font:
-        font_data = {
-            'name': cell.font.name, 'sz': cell.font.sz, 'bold': cell.font.bold,
-            'italic': cell.font.italic, 'color': get_serializable_color(cell.font.color)
-        }
-        style_data['font'] = {k: v for k, v in font_data.items() if v}
-    if cell.fill and cell.fill.fill_type:
-        fill_data = {
-            'pattern': cell.fill.fill_type,
-            'start_color': get_serializable_color(cell.fill.start_color),
-            'end_color': get_serializable_color(cell.fill.end_color)
-        }
-        style_data['fill'] = {k: v for k, v in fill_data.items() if v}
-    if cell.border:
-        def get_side_style(side):
-            if side and side.style:
-                return {'style': side.style, 'color': get_serializable_color(side.color)}
-            return None
-        border_data = {
-            'left': get_side_style(cell.border.left), 'right': get_side_style(cell.border.right),
-            'top': get_side_style(cell.border.top), 'bottom': get_side_style(cell.border.bottom)
-        }
-        style_data['border'] = {k: v for k, v in border_data.items() if v}
-    if cell.alignment:
-        alignment_data = {
-            'horizontal': cell.alignment.horizontal, 'vertical': cell.alignment.vertical,
-            'wrap_text': cell.alignment.wrap_text
-        }
-        style_data['alignment'] = {k: v for k, v in alignment_data.items() if v}
-    if cell.number_format and cell.number_format != 'General':
-        style_data['numFmt'] = cell.number_format
+    # Solo se asignan los campos con valor y solo se añade cada bloque si no queda vacío,
+    # sin construir antes un dict completo para filtrarlo.
+    if font:
+        font_data = {}
+        if font.name:
+            font_data['name'] = font.name
+        if font.sz:
+            font_data['sz'] = font.sz
+        if font.bold:
+            font_data['bold'] = font.bold
+        if font.italic:
+            font_data['italic'] = font.italic
+        color = get_serializable_color(font.color)
+        if color:
+            font_data['color'] = color
+        if font_data:
+            style_data['font'] = font_data
+    if fill and fill.fill_type:
+        fill_data = {'pattern': fill.fill_type}
+        color = get_serializable_color(fill.start_color)
+        if color:
+            fill_data['start_color'] = color
+        color = get_serializable_color(fill.end_color)
+        if color:
+            fill_data['end_color'] = color
+        style_data['fill'] = fill_data
+    if border:
+        # Una sola pasada por los cuatro lados, sin dict intermedio con valores None.
+        border_data = {}
+        for side_name in _SIDE_NAMES:
+            side_data = _side_style(getattr(border, side_name))
+            if side_data:
+                border_data[side_name] = side_data
+        if border_data:
+            style_data['border'] = border_data
+    if alignment:
+        alignment_data = {}
+        if alignment.horizontal:
+            alignment_data['horizontal'] = alignment.horizontal
+        if alignment.vertical:
+            alignment_data['vertical'] = alignment.vertical
+        if alignment.wrap_text:
+            alignment_data['wrap_text'] = alignment.wrap_text
+        if alignment_data:
+            style_data['alignment'] = alignment_data
+    if number_format and number_format != 'General':
+        style_data['numFmt'] = number_format
     return style_data
 
 def extract_conditional_formats(ws):
     formats_data = []
+    # La mayoría de hojas no tienen formatos condicionales: se evita recorrer la colección vacía.
+    if not getattr(ws.conditional_formatting, '_cf_rules', None):
+        return formats_data
     for cf_rule_obj in ws.conditional_formatting:
         range_string = str(cf_rule_obj.sqref)
         for rule in cf_rule_obj.rules:
@@ -84,9 +191,10 @@ def extract_conditional_formats(ws):
 def extract_charts(ws):
     """Extrae el ancla del gráfico de forma legible."""
     charts_data = []
-    if not hasattr(ws, '_charts'):
+    charts = getattr(ws, '_charts', None)
+    if not charts:
         return charts_data
-    for chart in ws._charts:
+    for chart in charts:
         anchor_str = str(chart.anchor)
         try:
             _from = chart.anchor._from
@@ -98,23 +206,692 @@ def extract_charts(ws):
             anchor_str = f"{from_col}{from_row}:{to_col}{to_row}"
         except:
             pass
-        title_text = None
-        if chart.title and hasattr(chart.title, 'text') and chart.title.text and hasattr(chart.title.text, 'v'):
-            title_text = chart.title.text.v
+        # getattr con valor por defecto en lugar de hasattr() + acceso: una sola búsqueda por atributo.
+        title_text = getattr(getattr(chart.title, 'text', None), 'v', None)
         chart_info = { 'type': chart.__class__.__name__, 'title': title_text, 'anchor': anchor_str, 'series': [] }
         if chart.series:
             for s in chart.series:
-                header_text = None
-                if s.tx and hasattr(s.tx, 'v'): header_text = s.tx.v
+                values_ref = getattr(s.val, 'ref', None)
+                categories_ref = getattr(s.cat, 'ref', None)
                 series_info = {
-                    'header': header_text,
-                    'values': str(s.val.ref) if s.val and hasattr(s.val, 'ref') else None,
-                    'categories': str(s.cat.ref) if s.cat and hasattr(s.cat, 'ref') else None,
+                    'header': getattr(s.tx, 'v', None),
+                    'values': str(values_ref) if values_ref is not None else None,
+                    'categories': str(categories_ref) if categories_ref is not None else None,
                 }
                 chart_info['series'].append(series_info)
         charts_data.append(chart_info)
     return charts_data
 
+def iter_sheet_rows(ws, values_only, merged_ranges):
+    """Equivale a ws.iter_rows(values_only=...) de una hoja read_only y, al agotarse, deja en
+    merged_ranges los rangos combinados de la hoja.
+
+    openpyxl no expone los rangos combinados en modo read_only, aunque su propio parser los
+    lee: <mergeCells> va después de <sheetData>, así que se recogen del mismo parser al
+    terminar las filas, sin una segunda pasada por el XML de la hoja. A diferencia de
+    iter_rows, no recorta las celdas que quedan fuera de la dimensión declarada.
+    """
+    # Réplica de ReadOnlyWorksheet._cells_by_row (openpyxl 3.1) con min_row = min_col = 1.
+    max_col = ws.max_column
+    max_row = ws.max_row
+    empty_row = []
+    if max_col is not None:
+        empty_row = (None if values_only else EMPTY_CELL,) * max_col
+    counter = 1
+    idx = 1
+    source = ws._get_source()
+    try:
+        wb = ws.parent
+        parser = WorkSheetParser(source, ws._shared_strings, data_only=wb.data_only,
+                                 epoch=wb.epoch, date_formats=wb._date_formats,
+                                 # ReadOnlyWorksheet no pasa los formatos de duración y las
+                                 # celdas [h]:mm:ss saldrían como fechas de 1900.
+                                 timedelta_formats=wb._timedelta_formats)
+        for idx, row in parser.parse():
+            # Una dimensión declarada puede estar desfasada o ser demasiado pequeña: las celdas
+            # fuera de ella no se descartan, sino que amplían el ancho de esta fila y de las
+            # siguientes (las ya emitidas conservan el ancho que tenían).
+            if row and max_col is not None and row[-1]['column'] > max_col:
+                max_col = row[-1]['column']
+                empty_row = (None if values_only else EMPTY_CELL,) * max_col
+            # Filas que no aparecen en el XML
+            for _ in range(counter, idx):
+                counter += 1
+                yield empty_row
+            if counter <= idx:
+                counter += 1
+                yield ws._get_row(row, 1, max_col, values_only)
+    finally:
+        source.close()
+    if max_row is not None and max_row < idx:
+        for _ in range(counter, max_row + 1):
+            yield empty_row
+    if parser.merged_cells is not None:
+        merged_ranges.extend(map(attrgetter('coord'), parser.merged_cells.mergeCell))
+
+def workbook_has_styles(wb):
+    """Indica si alguna celda puede tener estilo: la entrada 0 de cellXfs es la que usan las celdas sin estilo."""
+    return len(wb._cell_styles) > 1
+
+def freeze_style(style):
+    """Convierte un estilo (dicts anidados) en una clave hashable para deduplicarlo por contenido."""
+    if isinstance(style, dict):
+        return tuple(sorted((key, freeze_style(value)) for key, value in style.items()))
+    return style
+
+def build_style_table(wb):
+    """Tabla de estilos del libro, deduplicada por contenido (como styles.xml en el propio xlsx).
+
+    Devuelve (style_index, styles): style_index[style_id] es la posición en styles del estilo
+    de las celdas con ese _style_id, o None para el 0 (celdas sin estilo).
+    """
+    styles = []
+    style_index = [None]
+    by_ids = {}
+    by_content = {}
+    cell_styles = wb._cell_styles
+    for style_id in range(1, len(cell_styles)):
+        # Solo estas partes del xf intervienen en el estilo extraído: los xf que solo
+        # difieren en protección, xfId, etc. comparten entrada sin volver a extraerse.
+        xf = cell_styles[style_id]
+        ids = (xf.fontId, xf.fillId, xf.borderId, xf.numFmtId, xf.alignmentId)
+        idx = by_ids.get(ids)
+        if idx is None:
+            # Las partes se toman directamente de las tablas del libro, como hacen las propiedades
+            # de ReadOnlyCell, pero sin pasar por una celda ni volver a cellXfs en cada acceso.
+            num_fmt_id = xf.numFmtId
+            if num_fmt_id < BUILTIN_FORMATS_MAX_SIZE:
+                number_format = BUILTIN_FORMATS.get(num_fmt_id, 'General')
+            else:
+                number_format = wb._number_formats[num_fmt_id - BUILTIN_FORMATS_MAX_SIZE]
+            style = extract_style(wb._fonts[xf.fontId], wb._fills[xf.fillId], wb._borders[xf.borderId],
+                                  wb._alignments[xf.alignmentId], number_format)
+            idx = by_content.setdefault(freeze_style(style), len(styles))
+            if idx == len(styles):
+                styles.append(style)
+            by_ids[ids] = idx
+        style_index.append(idx)
+    return style_index, styles
+
+# Dimensiones declaradas a partir de las cuales se asume que están infladas (p. ej. 'A1:BK1048501'
+# en hojas con unos cientos de filas): confiar en ellas rellenaría cada fila hasta ese ancho.
+SUSPICIOUS_MAX_ROW = 1000000
+SUSPICIOUS_MAX_COLUMN = 16000
+
+def reset_suspicious_dimensions(ws):
+    """Descarta dimensiones ausentes o sospechosas para no truncar ni inflar la lectura read_only.
+
+    'A1:A1' suele indicar que el programa que generó el archivo no calculó el rango, y un
+    rango cercano a los límites de Excel, que se declararon filas o columnas fantasma.
+    """
+    try:
+        dimension = ws.calculate_dimension()
+    except ValueError:
+        dimension = None
+    if (dimension in (None, 'A1:A1') or ws.max_row >= SUSPICIOUS_MAX_ROW
+            or ws.max_column >= SUSPICIOUS_MAX_COLUMN):
+        ws.reset_dimensions()
+
+# === GENERACIÓN DE LA RESPUESTA EN STREAMING ===
+
+# orjson codifica en C todos los tipos que devuelven las celdas (str, int, float, bool, None y
+# fechas/horas en ISO 8601); el hook de Flask solo se llama para tipos poco habituales
+# (Decimal, UUID...) en lugar de para cada fecha.
+
+def json_default(obj):
+    """Tipos que orjson no codifica: las duraciones ([h]:mm:ss) como segundos totales; el resto como jsonify."""
+    if isinstance(obj, timedelta):
+        return obj.total_seconds()
+    return app.json.default(obj)
+
+def _json_fallback_default(obj):
+    """json_default para el codificador de la biblioteca estándar, con las fechas en ISO 8601 como orjson."""
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    return json_default(obj)
+
+def dumps_json(obj):
+    """Serializa un fragmento de la respuesta (bytes UTF-8) con los mismos tipos que admite jsonify."""
+    try:
+        return orjson.dumps(obj, default=json_default)
+    except orjson.JSONEncodeError:
+        # orjson no admite enteros de más de 64 bits (una celda '123456789012345678901234567890')
+        # ni llama a default para ellos: ese fragmento se codifica con json, como hacía jsonify.
+        return json.dumps(obj, default=_json_fallback_default, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+
+# Tamaño mínimo de cada trozo enviado al cliente: agrupar las filas evita una
+# escritura al socket (y una vuelta por el servidor WSGI) por cada fila de la hoja.
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_KB', '64')) * 1024
+
+def coalesce_chunks(chunks, size=STREAM_CHUNK_SIZE):
+    """Agrupa los fragmentos de bytes generados en bloques de al menos `size` bytes."""
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield b''.join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield b''.join(buffer)
+
+# La matriz de estilos de una hoja se emite tras la de valores; hasta entonces se guarda
+# serializada en memoria solo hasta este tamaño y, por encima, en un fichero temporal.
+STYLE_SPOOL_MAX_BYTES = 1024 * 1024
+
+def build_sheet_header(ws, full_wb, include):
+    """Claves de la hoja que no dependen de sus celdas (gráficos y formatos condicionales si se piden)."""
+    sheet_name = ws.title
+    sheet_header = {'name': sheet_name}
+    if 'cf' in include:
+        sheet_header['conditional_formats'] = extract_conditional_formats(full_wb[sheet_name])
+    if 'charts' in include:
+        sheet_header['charts'] = extract_charts(full_wb[sheet_name])
+    return sheet_header
+
+def _iter_sheet_chunks(ws, sheet_header, style_index, values_only):
+    """Genera el objeto JSON de una hoja fila a fila.
+
+    style_index (de build_style_table) traduce cell._style_id a la posición del estilo en
+    la lista 'styles' del libro; es None si no hay estilos que extraer.
+    """
+    has_styles = style_index is not None
+    # Globales enlazados como locales para el bucle por celda (LOAD_FAST en vez de LOAD_GLOBAL).
+    _isinstance = isinstance
+    _ReadOnlyCell = ReadOnlyCell
+    _len = len
+    _dumps = dumps_json
+    reset_suspicious_dimensions(ws)
+    # Las celdas combinadas no se marcan una a una: el cliente las deduce de 'merged_cells',
+    # que se rellena al terminar de leer las filas y se emite tras 'data'.
+    merged_ranges = []
+    # Se reabre el objeto de la hoja (sin su '}') para añadir 'data' fila a fila.
+    yield dumps_json(sheet_header)[:-1] + b',"data":{"values":['
+
+    def value_rows():
+        # Sin estilos que extraer basta con los valores: iter_rows(values_only=True)
+        # devuelve tuplas que orjson serializa sin crear un objeto celda por posición.
+        for row_idx, row in enumerate(iter_sheet_rows(ws, True, merged_ranges), start=1):
+            if row.count(None) == _len(row):
+                yield row_idx, None, None, _len(row)
+            else:
+                yield row_idx, row, None, _len(row)
+
+    def styled_rows():
+        for row_idx, row in enumerate(iter_sheet_rows(ws, False, merged_ranges), start=1):
+            values = [cell.value for cell in row]
+            # style_index[0] es None: _style_id 0 equivale a has_style False
+            # (EmptyCell tampoco tiene estilo).
+            styles = [
+                style_index[cell._style_id] if _isinstance(cell, _ReadOnlyCell) else None
+                for cell in row
+            ]
+            if styles.count(None) == _len(styles):
+                if values.count(None) == _len(values):
+                    yield row_idx, None, None, _len(row)
+                else:
+                    yield row_idx, values, None, _len(row)
+            else:
+                yield row_idx, values, styles, _len(row)
+
+    # Las filas en blanco (sin valores ni estilos) se acumulan como tramos
+    # [primera, última, ancho] y solo se emiten si después aparece una fila con
+    # contenido: las del final de la hoja (dimensiones infladas, filas con solo
+    # formato de fila) se descartan sin recorrerlas dos veces ni guardarlas en memoria.
+    blank_runs = []
+    # La matriz de estilos se escribe después de la de valores; mientras tanto se vuelca
+    # ya serializada (b'null' para las filas sin estilos) a un fichero temporal en memoria
+    # que pasa a disco si crece, para no retener la hoja entera.
+    style_spool = None if values_only else tempfile.SpooledTemporaryFile(max_size=STYLE_SPOOL_MAX_BYTES)
+    try:
+        separator = b''
+        n_rows = n_cols = 0
+        for row_idx, values, styles, width in (styled_rows() if has_styles else value_rows()):
+            if values is None:
+                if blank_runs and blank_runs[-1][1] == row_idx - 1 and blank_runs[-1][2] == width:
+                    blank_runs[-1][1] = row_idx
+                else:
+                    blank_runs.append([row_idx, row_idx, width])
+                continue
+            for first, last, blank_width in blank_runs:
+                blank_row = _dumps([None] * blank_width)
+                for _ in range(first, last + 1):
+                    yield separator + blank_row
+                    if style_spool is not None:
+                        style_spool.write(separator + b'null')
+                    separator = b','
+                n_cols = max(n_cols, blank_width)
+            blank_runs.clear()
+            yield separator + _dumps(values)
+            if style_spool is not None:
+                style_spool.write(separator + (b'null' if styles is None else _dumps(styles)))
+            separator = b','
+            n_rows = row_idx
+            n_cols = max(n_cols, width)
+        yield b']'
+        if style_spool is not None:
+            yield b',"styles":['
+            style_spool.seek(0)
+            for block in iter(lambda: style_spool.read(STREAM_CHUNK_SIZE), b''):
+                yield block
+            yield b']'
+    finally:
+        if style_spool is not None:
+            style_spool.close()
+    yield b',"rows":%d,"cols":%d}' % (n_rows, n_cols)
+    if not values_only:
+        yield b',"merged_cells":' + _dumps(merged_ranges)
+    yield b'}'
+
+def worksheet_names(wb):
+    """Nombres de las hojas con celdas (sin hojas de gráfico) de un libro de calamine u openpyxl."""
+    if CalamineWorkbook is not None and isinstance(wb, CalamineWorkbook):
+        return [sheet.name for sheet in wb.sheets_metadata if sheet.typ == SheetTypeEnum.WorkSheet]
+    return [ws.title for ws in wb.worksheets]
+
+def _stream_sheets(wb, full_wb, include, values_only=False, parallel_path=None, sheet_names=None):
+    """Genera el JSON de la respuesta hoja a hoja, sin materializar el libro completo en memoria.
+
+    Con values_only se omiten estilos y rangos combinados (modo ?mode=values). Si se
+    indica parallel_path (copia del libro en disco), cada hoja se procesa en el pool de hojas.
+    sheet_names limita la respuesta a esas hojas (None: todas).
+    """
+    futures = deque()
+    try:
+        yield b'{"schema":' + dumps_json(RESPONSE_SCHEMA)
+        # En libros de datos sin formato se evita por completo la extracción de estilos.
+        style_index = None
+        if not values_only:
+            styles = []
+            if workbook_has_styles(wb):
+                style_index, styles = build_style_table(wb)
+            yield b',"styles":' + dumps_json(styles)
+        yield b',"sheets":['
+        # wb.worksheets recorre las hojas en orden sin pasar por wb[nombre] y deja fuera
+        # las hojas de gráfico (Chartsheet), que no tienen celdas.
+        worksheets = wb.worksheets
+        if sheet_names is not None:
+            worksheets = [ws for ws in worksheets if ws.title in sheet_names]
+        headers = [build_sheet_header(ws, full_wb, include) for ws in worksheets]
+        if parallel_path is not None:
+            tasks = ((parallel_path, header['name'], header, style_index, values_only) for header in headers)
+            sheet_chunks = _iter_parallel_sheets(get_sheet_executor(), futures, tasks, SHEET_WORKERS)
+        else:
+            sheet_chunks = (
+                _iter_sheet_chunks(ws, header, style_index, values_only)
+                for ws, header in zip(worksheets, headers)
+            )
+        for sheet_idx, chunks in enumerate(sheet_chunks):
+            if sheet_idx:
+                yield b','
+            yield from chunks
+        yield b']}'
+    except Exception as e:
+        # Las cabeceras ya se enviaron: solo queda registrar el error y cortar la respuesta.
+        log.exception("Error en /parse-excel (streaming): %s", e)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+        wb.close()
+        if parallel_path is not None:
+            os.remove(parallel_path)
+
+# Mayor entero que un float representa sin pérdida; más allá se deja como float
+# (orjson además no admite enteros de más de 64 bits).
+MAX_EXACT_FLOAT_INT = 2.0 ** 53
+
+def _stream_calamine_sheets(wb, sheet_names=None):
+    """Variante de _stream_sheets para el modo values con python-calamine (solo valores)."""
+    try:
+        yield b'{"schema":' + dumps_json(RESPONSE_SCHEMA) + b',"sheets":['
+        selected = [name for name in worksheet_names(wb) if sheet_names is None or name in sheet_names]
+        for sheet_idx, sheet_name in enumerate(selected):
+            yield (b',' if sheet_idx else b'') + b'{"name":' + dumps_json(sheet_name) + b',"data":{"values":['
+            # iter_rows() recorre la hoja fila a fila sin construir antes la lista completa
+            # (to_python). Las filas empiezan en la 1, pero las columnas empiezan en la
+            # primera con datos (sheet.start): se rellenan por la izquierda para alinear con A1.
+            sheet = wb.get_sheet_by_name(sheet_name)
+            col_offset = sheet.start[1] if sheet.start is not None else 0
+            padding = [None] * col_offset
+            n_rows = n_cols = 0
+            for row in sheet.iter_rows():
+                # calamine devuelve '' para las celdas vacías (openpyxl devuelve None) y todos los
+                # números como float (openpyxl devuelve int para los enteros).
+                values = [
+                    None if value == '' else
+                    int(value) if value.__class__ is float and value.is_integer()
+                    and -MAX_EXACT_FLOAT_INT <= value <= MAX_EXACT_FLOAT_INT else value
+                    for value in row
+                ]
+                if col_offset:
+                    values[:0] = padding
+                n_cols = max(n_cols, len(values))
+                yield (b',' if n_rows else b'') + dumps_json(values)
+                n_rows += 1
+            yield b'],"rows":%d,"cols":%d}}' % (n_rows, n_cols)
+        yield b']}'
+    except Exception as e:
+        log.exception("Error en /parse-excel (streaming): %s", e)
+        raise
+    finally:
+        wb.close()
+
+# === PROCESAMIENTO DE HOJAS EN PARALELO ===
+
+# Por debajo de este tamaño, repartir las hojas entre procesos cuesta más de lo que ahorra.
+PARALLEL_MIN_BYTES = 1024 * 1024
+# 'process' (por defecto) reparte las hojas entre procesos; 'thread' usa hilos del propio proceso
+# servidor: sin arranque de procesos ni copia de resultados, pero el GIL limita la ganancia al
+# tiempo que el parser XML pasa fuera de él.
+SHEET_EXECUTOR = os.environ.get('SHEET_EXECUTOR', 'process').lower()
+# Tamaño del pool de hojas de cada proceso servidor. Con varios workers de gunicorn cada uno
+# tiene su propio pool: gunicorn.conf.py reparte los núcleos entre ellos (núcleos / workers,
+# como mínimo 2). Con SHEET_WORKERS=1 las hojas siempre se procesan en serie.
+SHEET_WORKERS = max(1, int(os.environ.get('SHEET_WORKERS', '0')) or os.cpu_count() or 1)
+
+_sheet_executor = None
+_sheet_executor_lock = threading.Lock()
+
+def get_sheet_executor():
+    """Pool de hojas compartido, creado en el primer uso dentro de cada proceso servidor."""
+    global _sheet_executor
+    with _sheet_executor_lock:
+        if _sheet_executor is None:
+            if SHEET_EXECUTOR == 'thread':
+                _sheet_executor = ThreadPoolExecutor(max_workers=SHEET_WORKERS)
+            else:
+                # 'spawn' evita hacer fork de un proceso servidor que ya tiene hilos en marcha.
+                _sheet_executor = ProcessPoolExecutor(max_workers=SHEET_WORKERS,
+                                                      mp_context=multiprocessing.get_context('spawn'))
+        return _sheet_executor
+
+def reset_sheet_executor(broken_executor):
+    """Descarta un pool roto (p. ej. un proceso hijo muerto por falta de memoria); el siguiente
+    get_sheet_executor() crea uno nuevo en lugar de fallar en todas las peticiones siguientes."""
+    global _sheet_executor
+    with _sheet_executor_lock:
+        if _sheet_executor is broken_executor:
+            _sheet_executor = None
+    broken_executor.shutdown(wait=False, cancel_futures=True)
+
+def use_parallel_sheets(sheet_count, file_size):
+    """Las hojas se reparten en el pool solo si hay varias, varios workers en el pool y el archivo es grande."""
+    return sheet_count > 1 and file_size >= PARALLEL_MIN_BYTES and SHEET_WORKERS > 1
+
+# Una subida sin seek se copia a un SpooledTemporaryFile: en memoria hasta este tamaño, en disco a partir de él.
+UPLOAD_SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+def seekable_upload(stream):
+    """Devuelve la subida tal cual si admite seek (zipfile lo necesita); si no, una copia por bloques de 1 MiB."""
+    # Se prueba seek/tell directamente: en Python 3.10 SpooledTemporaryFile (el que usa
+    # Werkzeug para las subidas) no tiene seekable() aunque sí admite seek.
+    try:
+        stream.seek(stream.tell())
+        return stream
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
+    spooled = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_BYTES)
+    shutil.copyfileobj(stream, spooled, 1024 * 1024)
+    spooled.seek(0)
+    return spooled
+
+def write_temp_workbook(stream):
+    """Copia el libro subido a un archivo temporal que las tareas del pool abren por ruta."""
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    with os.fdopen(fd, 'wb') as temp_file:
+        stream.seek(0)
+        shutil.copyfileobj(stream, temp_file)
+    return path
+
+def _iter_parallel_sheets(executor, futures, tasks, window):
+    """Cuerpos de las hojas en orden, con como mucho `window` hojas en curso o esperando a enviarse.
+
+    Así la memoria no crece con el número de hojas: cada cuerpo se suelta al enviarlo. Las
+    tareas pendientes quedan en `futures` para que quien llama pueda cancelarlas. Si el pool
+    se rompe, se recrea para las peticiones siguientes y el resto de hojas de esta se procesa
+    en serie, así la respuesta no queda cortada.
+    """
+    tasks = list(tasks)
+    sent = 0
+    try:
+        for task in tasks[:window]:
+            futures.append(executor.submit(_parse_sheet_in_worker, *task))
+        next_task = len(futures)
+        while futures:
+            body = futures[0].result()
+            futures.popleft()
+            if next_task < len(tasks):
+                futures.append(executor.submit(_parse_sheet_in_worker, *tasks[next_task]))
+                next_task += 1
+            sent += 1
+            yield (body,)
+    except BrokenProcessPool:
+        log.warning("El pool de hojas se ha roto; se recrea y las hojas pendientes se procesan en serie")
+        for future in futures:
+            future.cancel()
+        futures.clear()
+        reset_sheet_executor(executor)
+        for task in tasks[sent:]:
+            yield (_parse_sheet_in_worker(*task),)
+
+def _parse_sheet_in_worker(path, sheet_name, sheet_header, style_index, values_only):
+    """Serializa una hoja completa en el pool; cada tarea abre su propio libro, así no se comparten objetos de openpyxl."""
+    wb = load_workbook(filename=path, read_only=True, data_only=values_only)
+    try:
+        return b''.join(_iter_sheet_chunks(wb[sheet_name], sheet_header, style_index, values_only))
+    finally:
+        wb.close()
+
+# === CACHÉ DE RESPUESTAS POR CONTENIDO ===
+
+# Los clientes suelen reenviar el mismo archivo mientras iteran: se guardan los últimos cuerpos
+# JSON ya serializados, por hash del archivo y opciones. La caché en memoria es por proceso
+# servidor; con RESPONSE_CACHE_DIR además se persisten en disco y los comparten todos los procesos.
+RESPONSE_CACHE_ENTRIES = int(os.environ.get('RESPONSE_CACHE_ENTRIES', '32'))
+RESPONSE_CACHE_MAX_BODY_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BODY_MB', '16')) * 1024 * 1024
+# Tope de memoria de la caché en cada proceso servidor: se expulsan las entradas menos usadas
+# hasta quedar por debajo, aunque no se haya llegado a RESPONSE_CACHE_ENTRIES.
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_MB', '64')) * 1024 * 1024
+RESPONSE_CACHE_DIR = os.environ.get('RESPONSE_CACHE_DIR') or None
+# Tope del directorio de caché en disco; al superarlo se borran los cuerpos menos usados.
+RESPONSE_CACHE_DIR_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_DIR_MAX_MB', '1024')) * 1024 * 1024
+# Sin caché en memoria ni en disco no se calcula el hash de la subida ni se acumula el cuerpo.
+RESPONSE_CACHE_ENABLED = RESPONSE_CACHE_ENTRIES > 0 or RESPONSE_CACHE_DIR is not None
+# Los cuerpos en disco sobreviven a los reinicios: se guardan en un subdirectorio por versión del
+# formato de salida (un número que se sube con cada cambio en la respuesta más un hash del esquema),
+# así un despliegue que cambia la salida nunca sirve cuerpos con el formato anterior.
+RESPONSE_FORMAT_VERSION = 1
+RESPONSE_CACHE_VERSION = 'v%d-%s' % (
+    RESPONSE_FORMAT_VERSION,
+    hashlib.blake2b(orjson.dumps(RESPONSE_SCHEMA, option=orjson.OPT_SORT_KEYS), digest_size=4).hexdigest(),
+)
+
+_response_cache = OrderedDict()
+_response_cache_bytes = 0
+_response_cache_lock = threading.Lock()
+
+def hash_upload(stream):
+    """Hash del archivo subido (xxh3-128 o BLAKE2b), leído por bloques para no copiarlo entero en memoria."""
+    digest = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    stream.seek(0)
+    for block in iter(lambda: stream.read(1024 * 1024), b''):
+        digest.update(block)
+    stream.seek(0)
+    return digest.digest()
+
+def cache_file_path(cache_key):
+    """Ruta del cuerpo cacheado en disco: <hash>-<modo>[-<secciones>][-<hash de hojas>].json"""
+    digest, mode, include, sheets = cache_key
+    parts = [digest.hex(), mode, *include]
+    if sheets:
+        # Los nombres de hoja pueden tener caracteres no válidos en un nombre de archivo.
+        parts.append(hashlib.blake2b('\0'.join(sheets).encode('utf-8'), digest_size=8).hexdigest())
+    name = '-'.join(parts)
+    return os.path.join(RESPONSE_CACHE_DIR, RESPONSE_CACHE_VERSION, name + '.json')
+
+def prune_disk_cache():
+    """Borra los cuerpos en disco menos usados (de cualquier versión) hasta quedar por debajo del tope."""
+    entries = []
+    total = 0
+    for version_dir in os.scandir(RESPONSE_CACHE_DIR):
+        if not version_dir.is_dir():
+            continue
+        for entry in os.scandir(version_dir.path):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    # La fecha de modificación hace de "último uso": las lecturas la actualizan.
+    entries.sort()
+    for _, size, path in entries:
+        if total <= RESPONSE_CACHE_DIR_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+def get_cached_response(cache_key):
+    with _response_cache_lock:
+        body = _response_cache.get(cache_key)
+        if body is not None:
+            _response_cache.move_to_end(cache_key)
+            return body
+    if RESPONSE_CACHE_DIR is None:
+        return None
+    path = cache_file_path(cache_key)
+    try:
+        with open(path, 'rb') as fh:
+            body = fh.read()
+        os.utime(path)
+    except OSError:
+        return None
+    put_cached_response(cache_key, body, persist=False)
+    return body
+
+def put_cached_response(cache_key, body, persist=True):
+    global _response_cache_bytes
+    if RESPONSE_CACHE_ENTRIES > 0 and len(body) <= RESPONSE_CACHE_MAX_BYTES:
+        with _response_cache_lock:
+            previous = _response_cache.pop(cache_key, None)
+            if previous is not None:
+                _response_cache_bytes -= len(previous)
+            _response_cache[cache_key] = body
+            _response_cache_bytes += len(body)
+            while (len(_response_cache) > RESPONSE_CACHE_ENTRIES
+                   or _response_cache_bytes > RESPONSE_CACHE_MAX_BYTES):
+                _, evicted = _response_cache.popitem(last=False)
+                _response_cache_bytes -= len(evicted)
+    if persist and RESPONSE_CACHE_DIR is not None and len(body) <= RESPONSE_CACHE_DIR_MAX_BYTES:
+        # Escritura atómica: otro proceso nunca lee un archivo a medio escribir.
+        path = cache_file_path(cache_key)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(body)
+            os.replace(tmp_path, path)
+            tmp_path = None
+            prune_disk_cache()
+        except OSError:
+            log.warning("No se pudo guardar la respuesta en la caché de disco", exc_info=True)
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+def cache_response_body(cache_key, chunks):
+    """Reenvía los fragmentos de la respuesta y, si se completa sin superar el límite, la guarda en caché."""
+    parts = []
+    size = 0
+    for chunk in chunks:
+        if parts is not None:
+            size += len(chunk)
+            if size > RESPONSE_CACHE_MAX_BODY_BYTES:
+                parts = None
+            else:
+                parts.append(chunk)
+        yield chunk
+    if parts is not None:
+        put_cached_response(cache_key, b''.join(parts))
+
+# === OPCIONES DE LA PETICIÓN ===
+
+# Secciones de ?include=. 'data' (celdas) siempre se incluye; el resto se calcula solo si se pide.
+INCLUDE_SECTIONS = {'data', 'charts', 'cf'}
+# Secciones que requieren abrir el libro en modo completo (no read_only).
+FULL_WORKBOOK_SECTIONS = {'charts', 'cf'}
+
+API_DOC = {
+    'POST /parse-excel': {
+        'body': "multipart/form-data con el archivo en el campo 'excel_file'",
+        'query': {
+            'mode': "'full' (por defecto: fórmulas, estilos y rangos combinados) o 'values' (solo valores calculados)",
+            'include': ("Lista separada por comas de: data (por defecto), charts (gráficos), "
+                        "cf (formatos condicionales). Solo en mode=full."),
+            'sheets': ("Hoja a procesar; se repite para varias (?sheets=A&sheets=B). Por defecto todas; "
+                       "el resto no se lee. El nombre se compara tal cual (con comas y espacios); si no "
+                       "es una hoja del libro se interpreta como lista separada por comas (?sheets=A,B). "
+                       "Un nombre inexistente devuelve 400."),
+            'names_only': "Con 1 solo devuelve {'sheets': [nombres]} sin leer las celdas.",
+        },
+    },
+    'GET /health': 'Estado del servicio y esta documentación.',
+    'cambios_incompatibles': [
+        ("Las fechas y horas de las celdas se emiten en ISO 8601 ('2024-01-31T10:30:00') en lugar "
+         "del formato HTTP ('Wed, 31 Jan 2024 10:30:00 GMT') de versiones anteriores."),
+    ],
+}
+
+def parse_include(raw_include):
+    """Convierte ?include=a,b en un set; devuelve None si contiene secciones desconocidas."""
+    include = {part.strip() for part in raw_include.split(',') if part.strip()}
+    if include - INCLUDE_SECTIONS:
+        return None
+    return include
+
+def resolve_sheet_filter(raw_sheets, available):
+    """Traduce los valores de ?sheets= a (hojas pedidas, nombres inexistentes).
+
+    Cada valor se toma primero como nombre exacto, sin recortar espacios, porque un nombre de
+    hoja puede contener comas; si no existe en el libro se interpreta como lista separada por comas.
+    Si no queda ningún nombre, devuelve None (todas las hojas).
+    """
+    available = set(available)
+    selected = set()
+    missing = []
+    for raw in raw_sheets:
+        if raw in available:
+            selected.add(raw)
+            continue
+        for name in raw.split(','):
+            if name in available:
+                selected.add(name)
+            elif name:
+                missing.append(name)
+    return (frozenset(selected) or None), missing
+
+# --- ENDPOINT DE ESTADO Y DOCUMENTACIÓN ---
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "ok", "api": API_DOC})
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    return jsonify({"error": f"El archivo supera el tamaño máximo permitido ({MAX_UPLOAD_MB} MB)."}), 413
+
 # --- ENDPOINT PARA ANALIZAR EXCEL ---
 @app.route('/parse-excel', methods=['POST'])
 def parse_excel():
@@ -125,40 +902,79 @@ def parse_excel():
     if file.filename == '':
         return jsonify({"error": "No se seleccionó ningún archivo."}), 400
     
+    # ?mode=values devuelve solo valores calculados (sin fórmulas, estilos ni rangos combinados).
+    mode = request.args.get('mode', 'full')
+    if mode not in ('full', 'values'):
+        return jsonify({"error": "El parámetro 'mode' debe ser 'full' o 'values'."}), 400
+    include = parse_include(request.args.get('include', 'data'))
+    if include is None:
+        return jsonify({"error": f"El parámetro 'include' solo admite: {', '.join(sorted(INCLUDE_SECTIONS))}."}), 400
+    raw_sheets = request.args.getlist('sheets')
+    names_only = request.args.get('names_only', '0') in ('1', 'true')
+
     try:
-        in_memory_file = io.BytesIO(file.read())
-        # --- CAMBIO CLAVE PARA OBTENER FÓRMULAS ---
-        wb = load_workbook(filename=in_memory_file, data_only=False)
-        
-        parsed_data = {'sheets': []}
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            sheet_data = {
-                'name': sheet_name,
-                'merged_cells': [str(r) for r in ws.merged_cells.ranges],
-                'data': [],
-                'conditional_formats': extract_conditional_formats(ws),
-                'charts': extract_charts(ws)
-            }
-            rows_data = []
-            for row in ws.iter_rows():
-                row_list = []
-                for cell in row:
-                    cell_info = {'address': cell.coordinate, 'value': cell.value}
-                    if isinstance(cell, MergedCell):
-                        cell_info['is_merged_part'] = True
-                    else:
-                        cell_info['style'] = extract_styles_from_cell(cell)
-                    row_list.append(cell_info)
-                rows_data.append(row_list)
-            sheet_data['data'] = rows_data
-            parsed_data['sheets'].append(sheet_data)
-        return jsonify(parsed_data)
+        # Werkzeug ya guarda la subida en un SpooledTemporaryFile con seek: se pasa tal cual
+        # a openpyxl en lugar de copiarla entera a memoria con file.read() + BytesIO.
+        upload = seekable_upload(file.stream)
+        file_size = upload.seek(0, os.SEEK_END)
+        upload.seek(0)
+        if names_only:
+            # Solo se leen los metadatos del libro, nunca las celdas.
+            if CalamineWorkbook is not None:
+                wb = CalamineWorkbook.from_filelike(upload)
+            else:
+                wb = load_workbook(filename=upload, read_only=True)
+            try:
+                return jsonify({"sheets": worksheet_names(wb)})
+            finally:
+                wb.close()
+        cache_key = None
+        if RESPONSE_CACHE_ENABLED:
+            cache_key = (hash_upload(upload), mode, tuple(sorted(include)) if mode == 'full' else (),
+                         tuple(sorted(raw_sheets)))
+            cached_body = get_cached_response(cache_key)
+            if cached_body is not None:
+                return Response(cached_body, mimetype='application/json')
+        if mode == 'values' and CalamineWorkbook is not None:
+            wb = CalamineWorkbook.from_filelike(upload)
+        else:
+            # --- CAMBIO CLAVE PARA OBTENER FÓRMULAS ---
+            # read_only=True recorre las celdas en streaming con memoria casi constante.
+            wb = load_workbook(filename=upload, read_only=True, data_only=(mode == 'values'))
+        available = worksheet_names(wb)
+        sheet_names, missing = resolve_sheet_filter(raw_sheets, available)
+        if missing:
+            wb.close()
+            return jsonify({"error": f"Hojas no encontradas en el libro: {', '.join(missing)}."}), 400
+        sheet_count = len(sheet_names) if sheet_names is not None else len(available)
+        if mode == 'values':
+            if CalamineWorkbook is not None:
+                body = _stream_calamine_sheets(wb, sheet_names)
+            else:
+                parallel_path = write_temp_workbook(upload) if use_parallel_sheets(sheet_count, file_size) else None
+                body = _stream_sheets(wb, None, set(), values_only=True, parallel_path=parallel_path,
+                                      sheet_names=sheet_names)
+        else:
+            # Los gráficos y formatos condicionales solo existen en el modo completo,
+            # así que ese segundo libro se abre únicamente si el cliente los pide.
+            full_wb = None
+            if include & FULL_WORKBOOK_SECTIONS:
+                full_wb = load_workbook(filename=upload, data_only=False)
+            parallel_path = write_temp_workbook(upload) if use_parallel_sheets(sheet_count, file_size) else None
+            body = _stream_sheets(wb, full_wb, include, parallel_path=parallel_path, sheet_names=sheet_names)
+        chunks = coalesce_chunks(body)
+        if cache_key is not None:
+            chunks = cache_response_body(cache_key, chunks)
+        response = Response(stream_with_context(chunks), mimetype='application/json')
+        # Evita que un proxy delante (nginx) acumule la respuesta entera antes de reenviarla.
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
     except Exception as e:
-        print(f"Error en /parse-excel: {e}")
-        traceback.print_exc()
-        return jsonify({"error": f"Error interno al procesar el archivo Excel: {str(e)}"}), 500
+        # El detalle (con traza) va al log; al cliente se le devuelve un mensaje fijo.
+        log.exception("Error en /parse-excel: %s", e)
+        return jsonify({"error": "Error interno al procesar el archivo Excel."}), 500
 
 # --- Punto de Entrada de la Aplicación ---
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Solo para desarrollo local; en producción la aplicación se sirve con gunicorn (gunicorn.conf.py).
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Configuración de Gunicorn para producción: un worker por núcleo, cada uno con varios
+# hilos, y la aplicación precargada antes del fork para compartir los módulos importados.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+# Cada worker tiene su propio pool de procesos para las hojas (app.py, SHEET_WORKERS): los
+# núcleos se reparten entre los workers para no lanzar del orden de núcleos² intérpretes, con un
+# mínimo de 2 para que el reparto de hojas siga activo con un worker por núcleo (con 1 nunca se
+# usaría). El pool solo se crea al llegar un libro grande con varias hojas; para darle más
+# núcleos a cada libro, bajar GUNICORN_WORKERS (o fijar SHEET_WORKERS).
+os.environ.setdefault('SHEET_WORKERS', str(max(2, multiprocessing.cpu_count() // workers)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+preload_app = True
+# Los libros grandes pueden tardar en procesarse; el valor por defecto (30 s) se queda corto.
+timeout = 120